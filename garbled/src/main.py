@@ -18,15 +18,13 @@ class YaoGarbler(ABC):
 
         for circuit in circuits["circuits"]:
             garbled_circuit = yao.GarbledCircuit(circuit)
-            pbits = garbled_circuit.get_pbits()
             entry = {
                 "circuit": circuit,
                 "garbled_circuit": garbled_circuit,
                 "garbled_tables": garbled_circuit.get_garbled_tables(),
                 "keys": garbled_circuit.get_keys(),
-                "pbits": pbits,
-                "pbits_out": {w: pbits[w]
-                              for w in circuit["out"]},
+                "pbits": garbled_circuit.get_pbits(),
+                "pbits_out": garbled_circuit.get_pbits_out(),
             }
             self.circuits.append(entry)
 
@@ -67,9 +65,11 @@ class Alice(YaoGarbler):
         a_wires = circuit.get("alice", [])  # Alice's wires
         a_inputs = {}  # map from Alice's wires to (key, encr_bit) inputs
         b_wires = circuit.get("bob", [])  # Bob's wires
+        # Iterate Bob's wires directly rather than scanning the whole key
+        # dict with an `in b_wires` list lookup per wire, which is quadratic
         b_keys = {  # map from Bob's wires to a pair (key, encr_bit)
-            w: self._get_encr_bits(pbits[w], key0, key1)
-            for w, (key0, key1) in keys.items() if w in b_wires
+            w: self._get_encr_bits(pbits[w], *keys[w])
+            for w in b_wires
         }
 
         print(f"======== {circuit['id']} ========")
@@ -79,13 +79,18 @@ class Alice(YaoGarbler):
                                     pbits[a_wires[i]] ^ self.in_bits[i])
 
         result = self.ot.get_result(a_inputs, b_keys)
+        # Assemble the output value as an int directly; the bit string is
+        # only built for printing, instead of being re-parsed with int(.., 2)
+        result_int = 0
+        for w in outputs:
+            result_int = (result_int << 1) | result[w]
         str_result = ' '.join([str(result[w]) for w in outputs])
         str_in_bits = ''.join([str(b) for b in self.in_bits])
 
         print(f"Alice{a_wires} =")
         for i in range(0, len(str_in_bits), self.bits):
             print(f"{' '.join(str_in_bits[i:i+self.bits])} ({int(str_in_bits[i:i+self.bits], 2)})")
-        print(f"Outputs{outputs} = {str_result} ({int(str_result.replace(' ', ''), 2)})")
+        print(f"Outputs{outputs} = {str_result} ({result_int})")
 
         return str_result
 
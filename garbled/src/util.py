@@ -1,5 +1,7 @@
 import json
 import operator
+import os
+import pickle
 import random
 import secrets
 import sympy
@@ -121,5 +123,18 @@ class PrimeGroup:
 
 # HELPER FUNCTIONS
 def parse_json(json_path):
+    """Load a circuit file, preferring the pickle sidecar when up to date.
+
+    BooleanCircuit writes a protocol-5 pickle next to every circuit JSON;
+    loading it skips re-parsing the whole gate list. A missing or stale
+    sidecar falls back to the JSON file.
+    """
+    pkl_path = json_path + ".pkl"
+    try:
+        if os.path.getmtime(pkl_path) >= os.path.getmtime(json_path):
+            with open(pkl_path, "rb") as pkl_file:
+                return pickle.load(pkl_file)
+    except OSError:
+        pass
     with open(json_path) as json_file:
         return json.load(json_file)
@@ -1,10 +1,34 @@
+import numpy as np
+import os
 import pickle
-import random
-from cryptography.fernet import Fernet
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+# Length of the wire keys in bytes (AES-128)
+KEY_LENGTH = 16
+
+# Gate count below which garbling stays serial: spawning worker processes
+# and pickling the wire keys costs more than the tables themselves
+PARALLEL_THRESHOLD = 512
+
+
+def generate_key():
+    """Generate a random AES-128 wire key."""
+    return secrets.token_bytes(KEY_LENGTH)
 
 
 def encrypt(key, data):
-    """Encrypt a message.
+    """Encrypt a message with AES-128-ECB.
+
+    The cryptography backend uses the CPU's AES-NI instructions, which is
+    what production garbling implementations rely on; the previous Fernet
+    scheme (CBC + HMAC + base64) cost an order of magnitude more per table
+    row. A pickled (key, p-bit) entry is 35 bytes, so after PKCS7 padding
+    and the double encryption each stored row is 64 bytes. ECB is
+    deterministic, but every row encrypts a distinct payload under its own
+    key pair, which is all the garbled-table construction needs.
 
     Args:
         key: The encryption key.
@@ -13,12 +37,14 @@ def encrypt(key, data):
     Returns:
         The encrypted message as a byte stream.
     """
-    f = Fernet(key)
-    return f.encrypt(data)
+    padder = padding.PKCS7(128).padder()
+    padded = padder.update(data) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(key), modes.ECB()).encryptor()
+    return encryptor.update(padded) + encryptor.finalize()
 
 
 def decrypt(key, data):
-    """Decrypt a message.
+    """Decrypt a message encrypted with AES-128-ECB.
 
     Args:
         key: The decryption key.
@@ -27,8 +53,10 @@ def decrypt(key, data):
     Returns:
         The decrypted message as a byte stream.
     """
-    f = Fernet(key)
-    return f.decrypt(data)
+    decryptor = Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+    padded = decryptor.update(data) + decryptor.finalize()
+    unpadder = padding.PKCS7(128).unpadder()
+    return unpadder.update(padded) + unpadder.finalize()
 
 
 def evaluate(circuit, g_tables, pbits_out, a_inputs, b_inputs):
@@ -79,17 +107,29 @@ def evaluate(circuit, g_tables, pbits_out, a_inputs, b_inputs):
     return evaluation
 
 
+def _garble_chunk(gates, keys, pbits):
+    """Garble a chunk of gates; runs in a worker process."""
+    return {gate["id"]: GarbledGate(gate, keys, pbits).get_garbled_table()
+            for gate in gates}
+
+
 class GarbledGate:
     """A representation of a garbled gate.
 
     Args:
         gate: A dict containing gate spec.
-        keys: A dict mapping each wire to a pair of keys.
-        pbits: A dict mapping each wire to its p-bit.
+        keys: An array mapping each wire id to a pair of keys.
+        pbits: An array mapping each wire id to its p-bit.
     """
+
+    # One instance is created per gate while garbling, so skip the
+    # per-instance __dict__ and keep the objects small.
+    __slots__ = ("keys", "pbits", "input", "output", "gate_type",
+                 "garbled_table", "clear_garbled_table")
+
     def __init__(self, gate, keys, pbits):
-        self.keys = keys  # dict of yao circuit keys
-        self.pbits = pbits  # dict of p-bits
+        self.keys = keys  # per-wire key pairs, indexed by wire id
+        self.pbits = pbits  # per-wire p-bits, indexed by wire id
         self.input = gate["in"]  # list of inputs'ID
         self.output = gate["id"]  # ID of output
         self.gate_type = gate["type"]  # Gate type: OR, AND, ...
@@ -120,12 +160,14 @@ class GarbledGate:
 
         # For each entry in the garbled table
         for encr_bit_in in (0, 1):
-            # Retrieve original bit
-            bit_in = encr_bit_in ^ self.pbits[inp]
+            # Retrieve original bit; the int() cast turns the numpy uint8
+            # from the p-bit array into a plain int, which pickles to a
+            # fraction of the size of a numpy scalar in the table rows
+            bit_in = encr_bit_in ^ int(self.pbits[inp])
             # Compute output bit according to the gate type
             bit_out = int(not (bit_in))
             # Compute encrypted bit with the p-bit table
-            encr_bit_out = bit_out ^ self.pbits[out]
+            encr_bit_out = bit_out ^ int(self.pbits[out])
             # Retrieve related keys
             key_in = self.keys[inp][bit_in]
             key_out = self.keys[out][bit_out]
@@ -147,13 +189,14 @@ class GarbledGate:
         """
         in_a, in_b, out = self.input[0], self.input[1], self.output
 
-        # Same model as for the NOT gate except for 2 inputs instead of 1
+        # Same model as for the NOT gate except for 2 inputs instead of 1;
+        # the int() casts keep numpy scalars out of the pickled rows
         for encr_bit_a in (0, 1):
             for encr_bit_b in (0, 1):
-                bit_a = encr_bit_a ^ self.pbits[in_a]
-                bit_b = encr_bit_b ^ self.pbits[in_b]
+                bit_a = encr_bit_a ^ int(self.pbits[in_a])
+                bit_b = encr_bit_b ^ int(self.pbits[in_b])
                 bit_out = int(operator(bit_a, bit_b))
-                encr_bit_out = bit_out ^ self.pbits[out]
+                encr_bit_out = bit_out ^ int(self.pbits[out])
                 key_a = self.keys[in_a][bit_a]
                 key_b = self.keys[in_b][bit_b]
                 key_out = self.keys[out][bit_out]
@@ -196,13 +239,15 @@ class GarbledCircuit:
         circuit: A dict containing circuit spec.
         pbits: Optional; a dict of p-bits for the given circuit.
     """
+
+    __slots__ = ("circuit", "gates", "wires", "max_wire", "pbits", "keys",
+                 "pbits_out", "garbled_tables")
+
     def __init__(self, circuit, pbits={}):
         self.circuit = circuit
         self.gates = circuit["gates"]  # list of gates
         self.wires = set()  # list of circuit wires
 
-        self.pbits = {}  # dict of p-bits
-        self.keys = {}  # dict of keys
         self.garbled_tables = {}  # dict of garbled tables
 
         # Retrieve all wire IDs from the circuit
@@ -210,33 +255,59 @@ class GarbledCircuit:
             self.wires.add(gate["id"])
             self.wires.update(set(gate["in"]))
         self.wires = list(self.wires)
+        self.max_wire = max(self.wires)
 
         self._gen_pbits(pbits)
+        # Cache the output p-bits once; every consumer reuses this dict
+        self.pbits_out = {w: int(self.pbits[w]) for w in circuit["out"]}
         self._gen_keys()
         self._gen_garbled_tables()
 
     def _gen_pbits(self, pbits):
-        """Create a dict mapping each wire to a random p-bit."""
+        """Create an array mapping each wire id to a random p-bit."""
+        # Wire ids are dense consecutive integers, so the p-bits live in a
+        # flat uint8 array indexed by wire id: the garbling loop then does
+        # array indexing instead of a dict lookup per table row
+        self.pbits = np.zeros(self.max_wire + 1, dtype=np.uint8)
         if pbits:
-            self.pbits = pbits
+            for wire, pbit in pbits.items():
+                self.pbits[wire] = pbit
         else:
-            self.pbits = {wire: random.randint(0, 1) for wire in self.wires}
+            wires = np.asarray(self.wires)
+            self.pbits[wires] = np.random.randint(0, 2, size=len(wires))
 
     def _gen_keys(self):
-        """Create pair of keys for each wire."""
+        """Create pair of keys for each wire, stored in a per-wire array."""
+        self.keys = np.empty(self.max_wire + 1, dtype=object)
         for wire in self.wires:
-            self.keys[wire] = (Fernet.generate_key(), Fernet.generate_key())
+            self.keys[wire] = (generate_key(), generate_key())
 
     def _gen_garbled_tables(self):
-        """Create the garbled table of each gate."""
-        for gate in self.gates:
-            garbled_gate = GarbledGate(gate, self.keys, self.pbits)
-            self.garbled_tables[gate["id"]] = garbled_gate.get_garbled_table()
+        """Create the garbled table of each gate.
+
+        Every table depends only on the already-generated keys and p-bits
+        of its own wires, so gates can be garbled in any order and
+        independently; large circuits are chunked across a process pool
+        with one chunk per core.
+        """
+        if len(self.gates) < PARALLEL_THRESHOLD:
+            for gate in self.gates:
+                garbled_gate = GarbledGate(gate, self.keys, self.pbits)
+                self.garbled_tables[gate["id"]] = garbled_gate.get_garbled_table()
+            return
+        workers = os.cpu_count() or 1
+        size = -(-len(self.gates) // workers)
+        chunks = [self.gates[i:i + size] for i in range(0, len(self.gates), size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for tables in executor.map(_garble_chunk, chunks,
+                                       [self.keys] * len(chunks),
+                                       [self.pbits] * len(chunks)):
+                self.garbled_tables.update(tables)
 
     def print_garbled_tables(self):
         """Print p-bits and a clear representation of all garbled tables."""
         print(f"======== {self.circuit['id']} ========")
-        print(f"P-BITS: {self.pbits}")
+        print(f"P-BITS: {self.get_pbits()}")
         for gate in self.gates:
             garbled_table = GarbledGate(gate, self.keys, self.pbits)
             garbled_table.print_garbled_table()
@@ -244,7 +315,11 @@ class GarbledCircuit:
 
     def get_pbits(self):
         """Return dict mapping each wire to its p-bit."""
-        return self.pbits
+        return {wire: int(self.pbits[wire]) for wire in self.wires}
+
+    def get_pbits_out(self):
+        """Return dict mapping each output wire to its p-bit."""
+        return self.pbits_out
 
     def get_garbled_tables(self):
         """Return dict mapping each gate to its garbled table."""
@@ -252,4 +327,4 @@ class GarbledCircuit:
 
     def get_keys(self):
         """Return dict mapping each wire to its pair of keys."""
-        return self.keys
+        return {wire: self.keys[wire] for wire in self.wires}